@@ -7,19 +7,29 @@ Robust IMAP -> webhook forwarder that:
 - Uses .env for IMAP creds and webhook URL
 - Retries HTTP posts with exponential backoff
 - Marks messages as SEEN only after successful forward
+- Optionally streams attachments to a size-capped on-disk spool
+- Optional cProfile/tracemalloc profiling of poll cycles (PROFILE_CYCLES or SIGUSR1)
+- `--once` one-shot mode for cron/systemd timers: STATUS pre-check against a
+  saved checkpoint, bs4/requests imported only when a message needs them
 - Logs to both stdout and file
 """
 
 import os
+import re
 import sys
 import time
 import json
+import signal
 import logging
 import imaplib
 import email
-import requests
+import email.message
+import codecs
+import hashlib
+import binascii
+import tempfile
 from email.header import decode_header
-from bs4 import BeautifulSoup
+from email.parser import BytesHeaderParser
 from datetime import datetime
 from dotenv import load_dotenv
 from typing import Optional, List, Dict
@@ -38,7 +48,17 @@ POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", "60"))  # seconds
 MAX_BODY_LENGTH = int(os.getenv("MAX_BODY_LENGTH", "2000"))
 CONFIG_FILE = os.getenv("CONFIG_FILE", "config.json")
 LOG_FILE = os.getenv("LOG_FILE", "email_forwarder_full.log")
+CHECKPOINT_FILE = os.getenv("CHECKPOINT_FILE", "email_forwarder.checkpoint")  # used by --once
 USER_AGENT = os.getenv("USER_AGENT", "email-forwarder/1.0")
+ATTACHMENTS_ENABLED = os.getenv("ATTACHMENTS_ENABLED", "0").lower() in ("1", "true", "yes")
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "attachments")
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(25 * 1024 * 1024)))
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", str(500 * 1024 * 1024)))
+FETCH_CHUNK_SIZE = int(os.getenv("FETCH_CHUNK_SIZE", "65536"))  # bytes per IMAP partial fetch
+PROFILE_CYCLES = int(os.getenv("PROFILE_CYCLES", "0"))  # profile the first N cycles after start
+PROFILE_SIGNAL_CYCLES = int(os.getenv("PROFILE_SIGNAL_CYCLES", "5"))  # cycles armed by SIGUSR1
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))  # profiled cycles kept on disk
 
 if not EMAIL or not PASSWORD or not WEBHOOK_URL:
     print("ERROR: EMAIL, PASSWORD, and WEBHOOK_URL must be set in .env")
@@ -56,14 +76,11 @@ sh = logging.StreamHandler(sys.stdout)
 sh.setFormatter(fmt)
 logger.addHandler(sh)
 
-# file handler
-fh = logging.FileHandler(LOG_FILE)
+# file handler (opened on first record, so a quiet --once run never touches it)
+fh = logging.FileHandler(LOG_FILE, delay=True)
 fh.setFormatter(fmt)
 logger.addHandler(fh)
 
-logger.info("Starting email forwarder (strict IMAP mode)")
-logger.info(f"IMAP: {IMAP_SERVER}:{IMAP_PORT} | Poll interval: {POLL_INTERVAL}s | Webhook: {WEBHOOK_URL}")
-
 # -------------------------
 # Helpers: config.json
 # -------------------------
@@ -146,6 +163,8 @@ def decode_mime_words(s: Optional[str]) -> str:
         return s
 
 def extract_text_from_html(html: str) -> str:
+    # bs4 is imported on first use; one-shot runs without HTML mail never load it
+    from bs4 import BeautifulSoup
     try:
         soup = BeautifulSoup(html, "html.parser")
         return soup.get_text(separator="\n", strip=True)
@@ -214,10 +233,423 @@ def safe_truncate(text: str, limit: int = MAX_BODY_LENGTH) -> str:
         return text
     return text[:limit].rstrip() + "\n\n...[truncated]"
 
+# -------------------------
+# Attachments: streaming spool
+# -------------------------
+SPOOL_LINE_MAX = 8192        # longest line kept whole before it is split
+HEADER_BLOCK_MAX = 64 * 1024  # header bytes kept per MIME part
+TEXT_PART_MAX = 256 * 1024   # decoded bytes kept per text/plain or text/html part
+
+class _IdentityDecoder:
+    failed = False
+
+    def feed(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+_B64_NON_ALPHABET = re.compile(rb"[^A-Za-z0-9+/=]")
+
+class _Base64Decoder:
+    """Incremental base64 decoder; carries the incomplete 4-char quantum over.
+    Characters outside the alphabet are dropped first, as message_from_bytes
+    does; failed is only set on a padding or length error.
+    """
+    def __init__(self):
+        self.pending = b""
+        self.failed = False
+
+    def feed(self, data: bytes) -> bytes:
+        data = self.pending + _B64_NON_ALPHABET.sub(b"", data)
+        cut = len(data) - len(data) % 4
+        self.pending = data[cut:]
+        try:
+            return binascii.a2b_base64(data[:cut]) if cut else b""
+        except binascii.Error:
+            self.failed = True
+            return b""
+
+    def flush(self) -> bytes:
+        data, self.pending = self.pending, b""
+        if not data:
+            return b""
+        try:
+            return binascii.a2b_base64(data + b"=" * (-len(data) % 4))
+        except binascii.Error:
+            self.failed = True
+            return b""
+
+class _QPDecoder:
+    """Incremental quoted-printable decoder; never splits an =XX escape."""
+    failed = False
+
+    def __init__(self):
+        self.pending = b""
+
+    def feed(self, data: bytes) -> bytes:
+        data = self.pending + data
+        cut = data.rfind(b"\n") + 1
+        if not cut and len(data) > SPOOL_LINE_MAX:
+            esc = data.rfind(b"=", len(data) - 2)
+            cut = esc if esc != -1 else len(data)
+        self.pending = data[cut:]
+        return binascii.a2b_qp(data[:cut])
+
+    def flush(self) -> bytes:
+        data, self.pending = self.pending, b""
+        return binascii.a2b_qp(data)
+
+def _make_decoder(cte: str):
+    cte = (cte or "").strip().lower()
+    if cte == "base64":
+        return _Base64Decoder()
+    if cte == "quoted-printable":
+        return _QPDecoder()
+    return _IdentityDecoder()
+
+class _TextSink:
+    """Keeps the first TEXT_PART_MAX decoded bytes of a body part."""
+    def __init__(self):
+        self.buf = bytearray()
+
+    def write(self, data: bytes):
+        room = TEXT_PART_MAX - len(self.buf)
+        if room > 0:
+            self.buf += data[:room]
+
+    def discard(self):
+        self.buf = bytearray()
+
+class _SpoolWriter:
+    """Temp file in the spool dir, hashed while it is written."""
+    def __init__(self, directory: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.skipped = None  # "too_large" | "decode_error"
+        fd, self.tmp_path = tempfile.mkstemp(prefix=".part-", dir=directory)
+        self.f = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes):
+        if self.skipped or not data:
+            return
+        if self.size + len(data) > self.max_bytes:
+            self.fail("too_large")
+            return
+        self.f.write(data)
+        self.sha256.update(data)
+        self.size += len(data)
+
+    def fail(self, reason: str):
+        """Stop writing and drop the temp file; commit reports reason as skipped"""
+        if not self.skipped:
+            self.skipped = reason
+            self.discard()
+
+    def discard(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        try:
+            os.unlink(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+class AttachmentSpool:
+    """Content-addressed directory of decoded attachments, capped at max_bytes total.
+    Files are named by their sha256 so identical attachments are stored once;
+    the oldest files are evicted when the cap is exceeded.
+    """
+    def __init__(self, directory: str, max_bytes: int, max_file_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def open(self) -> _SpoolWriter:
+        return _SpoolWriter(self.directory, self.max_file_bytes)
+
+    def commit(self, writer: _SpoolWriter, filename: str, content_type: str) -> dict:
+        info = {"filename": filename, "content_type": content_type}
+        if writer.skipped:
+            if writer.skipped == "too_large":
+                logger.warning(f"Attachment {filename!r} exceeds {self.max_file_bytes} bytes, not spooled")
+            else:
+                logger.warning(f"Attachment {filename!r} could not be decoded ({writer.skipped}), not spooled")
+            info.update({"size": None, "sha256": None, "path": None, "skipped": writer.skipped})
+            return info
+        writer.f.close()
+        writer.f = None
+        digest = writer.sha256.hexdigest()
+        dest = os.path.join(self.directory, digest)
+        if os.path.exists(dest):
+            # duplicate content: keep the existing copy, refresh its age
+            os.unlink(writer.tmp_path)
+            os.utime(dest)
+        else:
+            os.replace(writer.tmp_path, dest)
+            self._prune(keep=dest)
+        info.update({"size": writer.size, "sha256": digest, "path": os.path.abspath(dest)})
+        return info
+
+    def _prune(self, keep: str):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.startswith(".part-"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+                total -= size
+                logger.info(f"Evicted spooled attachment {path}")
+            except OSError:
+                pass
+
+_attachment_spool = None
+def get_attachment_spool() -> AttachmentSpool:
+    global _attachment_spool
+    if _attachment_spool is None:
+        _attachment_spool = AttachmentSpool(ATTACHMENT_DIR, SPOOL_MAX_BYTES, ATTACHMENT_MAX_BYTES)
+    return _attachment_spool
+
+class StreamingMessageParser:
+    """
+    Line-oriented MIME walker fed with fixed-size chunks of a raw RFC822 message.
+    Applies the same selection rules as get_first_text_block, including walking
+    into inline message/rfc822 parts, but attachment parts are decoded straight
+    into the spool, so memory stays bounded by
+    FETCH_CHUNK_SIZE + SPOOL_LINE_MAX + 2 * TEXT_PART_MAX whatever the message size.
+    Two deliberate differences, both because attachments are spooled rather than
+    parsed: a single-part message with a filename or attachment disposition is
+    spooled and returns ("", True), where get_first_text_block returns its text;
+    and an attached message/rfc822 is spooled whole instead of searched for text.
+    """
+    def __init__(self, spool: AttachmentSpool):
+        self.spool = spool
+        self.headers = None          # top-level headers (email.message.Message)
+        self.boundaries = []         # stack of open multipart boundaries
+        self.in_container = False    # inside multipart or message/rfc822 (walk() territory)
+        self.state = "headers"       # headers | body | skip
+        self.header_buf = bytearray()
+        self.linebuf = b""
+        self.mid_line = False
+        self.pending_eol = b""
+        self.part = None             # (headers, decoder, sink) of the current leaf
+        self.plain = None            # (bytes, charset)
+        self.html = None
+        self.has_attachment = False
+        self.attachments = []
+
+    # --- input ---
+    def feed(self, chunk: bytes):
+        data = self.linebuf + chunk
+        start = 0
+        while True:
+            nl = data.find(b"\n", start)
+            if nl == -1:
+                break
+            self._line(data[start:nl + 1], True)
+            start = nl + 1
+        rest = data[start:]
+        if len(rest) > SPOOL_LINE_MAX:
+            self._line(rest, False)
+            rest = b""
+        self.linebuf = rest
+
+    def close(self):
+        if self.linebuf:
+            self._line(self.linebuf, True)
+            self.linebuf = b""
+        if self.state == "headers":
+            self._start_part()
+        elif self.state == "body" and self.part is not None and not self.boundaries:
+            # single-part message: no delimiter owns the last line break
+            self._write_part(self.pending_eol)
+        self._end_part()
+
+    def abort(self):
+        """Drop the part in progress, removing any half-written spool file."""
+        if self.part is not None and isinstance(self.part[2], _SpoolWriter):
+            self.part[2].discard()
+        self.part = None
+
+    # --- state machine ---
+    def _line(self, line: bytes, complete: bool):
+        at_start = not self.mid_line
+        self.mid_line = not complete
+
+        if self.state == "headers":
+            if at_start and line in (b"\r\n", b"\n"):
+                self._start_part()
+            elif len(self.header_buf) < HEADER_BLOCK_MAX:
+                self.header_buf += line
+            return
+
+        if at_start and self.boundaries and line.startswith(b"--") and self._boundary(line.rstrip()):
+            return
+
+        if line.endswith(b"\r\n"):
+            content, eol = line[:-2], b"\r\n"
+        elif line.endswith(b"\n"):
+            content, eol = line[:-1], b"\n"
+        else:
+            content, eol = line, b""
+        if self.state == "body" and self.part is not None:
+            # the line break before a boundary belongs to the delimiter, so it is held back
+            self._write_part(self.pending_eol + content)
+        self.pending_eol = eol
+
+    def _write_part(self, data: bytes, final: bool = False):
+        _, decoder, sink = self.part
+        out = decoder.flush() if final else decoder.feed(data)
+        if decoder.failed and isinstance(sink, _SpoolWriter):
+            # a truncated file must not be hashed and sent as a valid attachment
+            sink.fail("decode_error")
+        sink.write(out)
+
+    def _boundary(self, marker: bytes) -> bool:
+        for i in range(len(self.boundaries) - 1, -1, -1):
+            b = self.boundaries[i]
+            if marker == b"--" + b + b"--":
+                self._end_part()
+                del self.boundaries[i:]
+                self.state = "skip"  # epilogue until an outer boundary
+                return True
+            if marker == b"--" + b:
+                self._end_part()
+                del self.boundaries[i + 1:]
+                self.state = "headers"
+                return True
+        return False
+
+    def _start_part(self):
+        hdrs = BytesHeaderParser().parsebytes(bytes(self.header_buf))
+        self.header_buf = bytearray()
+        self.pending_eol = b""
+        if self.headers is None:
+            self.headers = hdrs
+
+        if hdrs.get_content_maintype() == "multipart":
+            boundary = hdrs.get_boundary()
+            if boundary:
+                self.boundaries.append(boundary.encode("utf-8", errors="ignore"))
+                self.in_container = True
+                self.state = "skip"  # preamble
+                return
+
+        ctype = hdrs.get_content_type()
+        disp = str(hdrs.get("Content-Disposition") or "").lower()
+        fname = hdrs.get_filename()
+        if fname or "attachment" in disp:
+            self.has_attachment = True
+            sink = self.spool.open()
+        elif ctype == "message/rfc822":
+            # inline forwarded mail: msg.walk() descends into it, so parse its headers next
+            self.in_container = True
+            self.state = "headers"
+            return
+        elif self.in_container and not _charset_known(hdrs.get_content_charset()):
+            # get_first_text_block skips multipart text parts it cannot decode
+            sink = None
+        elif ctype == "text/plain" and self.plain is None:
+            sink = _TextSink()
+        elif ctype == "text/html" and self.html is None:
+            sink = _TextSink()
+        else:
+            sink = None
+        if sink is not None:
+            self.part = (hdrs, _make_decoder(hdrs.get("Content-Transfer-Encoding")), sink)
+        self.state = "body"
+
+    def _end_part(self):
+        if self.part is None:
+            return
+        self._write_part(b"", final=True)
+        hdrs, _, sink = self.part
+        self.part = None
+        if isinstance(sink, _SpoolWriter):
+            fname = decode_mime_words(hdrs.get_filename()) or "attachment"
+            self.attachments.append(self.spool.commit(sink, fname, hdrs.get_content_type()))
+        elif sink.buf:
+            text = (bytes(sink.buf), hdrs.get_content_charset() or "utf-8")
+            if hdrs.get_content_type() == "text/plain":
+                self.plain = text
+            else:
+                self.html = text
+
+    # --- output ---
+    def result(self) -> (str, bool, List[dict]):
+        """Return (body_text, has_attachment, attachments)"""
+        body = ""
+        if self.plain is not None:
+            body = _decode_bytes(*self.plain)
+        elif self.html is not None:
+            body = extract_text_from_html(_decode_bytes(*self.html))
+        return (body, self.has_attachment, self.attachments)
+
+def _charset_known(charset: Optional[str]) -> bool:
+    try:
+        codecs.lookup(charset or "utf-8")
+        return True
+    except LookupError:
+        return False
+
+def _decode_bytes(data: bytes, charset: str) -> str:
+    try:
+        return data.decode(charset, errors="ignore")
+    except LookupError:
+        return data.decode("utf-8", errors="ignore")
+
+def fetch_message_streaming(imap, num, parser: StreamingMessageParser) -> bool:
+    """Feed message `num` to parser in FETCH_CHUNK_SIZE partial fetches.
+    BODY.PEEK leaves the \\Seen flag alone; it is set after a successful forward.
+    """
+    typ, data = imap.fetch(num, "(RFC822.SIZE)")
+    if typ != "OK" or not data or not data[0]:
+        return False
+    line = data[0][0] if isinstance(data[0], tuple) else data[0]
+    m = re.search(rb"RFC822\.SIZE (\d+)", line)
+    if not m:
+        return False
+    total = int(m.group(1))
+
+    offset = 0
+    try:
+        while offset < total:
+            typ, data = imap.fetch(num, f"(BODY.PEEK[]<{offset}.{FETCH_CHUNK_SIZE}>)")
+            if typ != "OK":
+                parser.abort()
+                return False
+            chunk = next((d[1] for d in data if isinstance(d, tuple)), b"")
+            if not chunk:
+                break
+            parser.feed(chunk)
+            offset += len(chunk)
+        parser.close()
+    except Exception:
+        parser.abort()
+        raise
+    return True
+
 # -------------------------
 # HTTP post with retry
 # -------------------------
-def post_with_retry(url: str, payload: dict, max_retries: int = 4, timeout: int = 10) -> requests.Response:
+def post_with_retry(url: str, payload: dict, max_retries: int = 4, timeout: int = 10) -> "requests.Response":
+    import requests  # deferred like bs4: only needed once there is something to deliver
     backoff = 1
     headers = {"User-Agent": USER_AGENT}
     for attempt in range(1, max_retries + 1):
@@ -239,11 +671,12 @@ def post_with_retry(url: str, payload: dict, max_retries: int = 4, timeout: int
 # -------------------------
 # IMAP connection helper
 # -------------------------
-def connect_imap():
+def connect_imap(select: bool = True):
     try:
         imap = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
         imap.login(EMAIL, PASSWORD)
-        imap.select("INBOX")
+        if select:
+            imap.select("INBOX")
         return imap
     except imaplib.IMAP4.error as e:
         logger.error(f"IMAP login failure: {e}")
@@ -255,19 +688,30 @@ def connect_imap():
 # -------------------------
 # Core: strict search per configured sender
 # -------------------------
-def check_email_once():
+def check_email_once(imap=None) -> bool:
+    """Forward unseen mail from configured senders; logs out of imap when done.
+    Pass an already-selected connection to reuse it.
+    Returns False if something was left to retry on a later poll.
+    """
     cfg = reload_config_if_needed()
     groups = cfg.get("groups", {})
     if not groups:
         logger.info("No groups configured in config.json → skipping this cycle")
-        return
+        if imap is not None:
+            try:
+                imap.logout()
+            except Exception:
+                pass
+        return True
 
-    try:
-        imap = connect_imap()
-    except Exception as e:
-        logger.error("Skipping check due to IMAP error")
-        return
+    if imap is None:
+        try:
+            imap = connect_imap()
+        except Exception as e:
+            logger.error("Skipping check due to IMAP error")
+            return False
 
+    complete = True
     try:
         # build list of unique senders to check
         senders_to_check = []
@@ -280,7 +724,7 @@ def check_email_once():
         if not senders_to_check:
             logger.info("No senders configured to check")
             imap.logout()
-            return
+            return True
 
         logger.info(f"Checking {len(senders_to_check)} configured senders (strict IMAP search)")
 
@@ -291,10 +735,12 @@ def check_email_once():
                 typ, data = imap.search(None, f'(UNSEEN FROM "{sender}")')
             except Exception as e:
                 logger.warning(f"IMAP search failed for {sender}: {e}")
+                complete = False
                 continue
 
             if typ != "OK":
                 logger.warning(f"IMAP search returned {typ} for sender {sender}")
+                complete = False
                 continue
 
             ids = data[0].split()
@@ -305,22 +751,40 @@ def check_email_once():
 
             for num in ids:
                 try:
-                    typ, msgdata = imap.fetch(num, "(RFC822)")
-                    if typ != "OK":
-                        logger.warning(f"Failed fetch id {num} for {sender}: {typ}")
-                        continue
-                    raw = msgdata[0][1]
-                    msg = email.message_from_bytes(raw)
+                    if ATTACHMENTS_ENABLED:
+                        # stream the message in chunks; attachments go to the spool
+                        parser = StreamingMessageParser(get_attachment_spool())
+                        if not fetch_message_streaming(imap, num, parser):
+                            logger.warning(f"Failed streaming fetch id {num} for {sender}")
+                            complete = False
+                            continue
+                        msg = parser.headers or email.message.Message()
+                        body_text, has_attachment, attachments = parser.result()
+                    else:
+                        typ, msgdata = imap.fetch(num, "(RFC822)")
+                        if typ != "OK":
+                            logger.warning(f"Failed fetch id {num} for {sender}: {typ}")
+                            complete = False
+                            continue
+                        raw = msgdata[0][1]
+                        msg = email.message_from_bytes(raw)
+                        body_text, has_attachment = get_first_text_block(msg)
+                        attachments = []
+
+                    if _profile_sample_hook is not None:
+                        # message still in memory: a profiled cycle samples allocations here
+                        _profile_sample_hook(f"after parsing message {num.decode()} from {sender}")
 
                     # decode from & subject
                     raw_from = decode_mime_words(msg.get("From", ""))
                     subject = decode_mime_words(msg.get("Subject", "(No Subject)"))
 
-                    # parse body & attachments
-                    body_text, has_attachment = get_first_text_block(msg)
                     body_text = safe_truncate(body_text, MAX_BODY_LENGTH)
                     if has_attachment and not body_text:
-                        body_text = "[Attachment included — not downloaded]"
+                        if attachments:
+                            body_text = f"[{len(attachments)} attachment(s) included]"
+                        else:
+                            body_text = "[Attachment included — not downloaded]"
 
                     # determine target(s) by config.json mapping (same logic as Node)
                     target = find_target_for_sender(raw_from)
@@ -334,6 +798,9 @@ def check_email_once():
                         "subject": subject,
                         "body": body_text
                     }
+                    if attachments:
+                        # file references into the spool, never inline bytes
+                        payload["attachments"] = attachments
 
                     # POST with retry; if success -> mark seen
                     try:
@@ -347,9 +814,11 @@ def check_email_once():
                     except Exception as e:
                         logger.error(f"Failed to forward message from {raw_from}: {e}")
                         # do not mark seen -> will retry next poll
+                        complete = False
 
                 except Exception as e:
                     logger.exception(f"Error processing message id {num} from {sender}: {e}")
+                    complete = False
 
         try:
             imap.logout()
@@ -358,21 +827,238 @@ def check_email_once():
 
     except Exception as e:
         logger.exception("Unexpected error during check_email_once")
+        complete = False
         try:
             imap.logout()
         except Exception:
             pass
+    return complete
+
+# -------------------------
+# Profiling
+# -------------------------
+PROFILE_TOP_ALLOCS = 25
+PROFILE_TOP_FUNCS = 40
+PROFILE_TRACE_FRAMES = 10
+
+# Cycles left to profile. Checked once per cycle; 0 means profiling is off.
+_profile_remaining = PROFILE_CYCLES
+# Set by profile_cycle while it runs; check_email_once calls it after each parsed message.
+_profile_sample_hook = None
+
+def _toggle_profiling(signum, frame):
+    """SIGUSR1: arm profiling for the next PROFILE_SIGNAL_CYCLES cycles, or disarm it"""
+    global _profile_remaining
+    _profile_remaining = 0 if _profile_remaining else PROFILE_SIGNAL_CYCLES
+
+def install_profiling_signal():
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, _toggle_profiling)
+
+def run_cycle():
+    global _profile_remaining
+    if not _profile_remaining:
+        check_email_once()
+        return
+    _profile_remaining -= 1
+    profile_cycle(check_email_once)
+
+def _profiler_lines(*funcs) -> set:
+    """(filename, lineno) of the profiler's own code, including nested functions"""
+    import dis
+    lines = set()
+    for func in funcs:
+        code = func.__code__
+        last = max(line for _, line in dis.findlinestarts(code) if line)
+        lines.update((code.co_filename, n) for n in range(code.co_firstlineno, last + 1))
+    return lines
+
+def _drop_profiler_calls(stats, roots: set):
+    """Remove roots and every call made from them from a pstats.Stats, so the
+    profiler's own sampling does not show up in the dump or the summary.
+    """
+    dropped = set()
+    pending = set(roots)
+    while pending:
+        dropped |= pending
+        for func in pending:
+            stats.stats.pop(func, None)
+        pending = set()
+        for func, (cc, nc, tt, ct, callers) in list(stats.stats.items()):
+            for caller in [c for c in callers if c in dropped]:
+                c_nc, c_cc, c_tt, c_ct = callers.pop(caller)
+                cc, nc, tt, ct = cc - c_cc, nc - c_nc, tt - c_tt, ct - c_ct
+            stats.stats[func] = (cc, nc, tt, ct, callers)
+            if nc <= 0:
+                pending.add(func)
+    stats.total_tt = sum(tt for _, _, tt, _, _ in stats.stats.values())
+
+def profile_cycle(fn):
+    """Run fn under cProfile and tracemalloc, then write
+    <PROFILE_DIR>/cycle-<timestamp>.prof (pstats dump) and .txt (summary).
+    Allocations are snapshotted after each parsed message and at the end of
+    the cycle; the summary lists the snapshot with the most traced memory.
+    Snapshot time is excluded from the profile clock and from elapsed.
+    """
+    global _profile_sample_hook
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    base = os.path.join(PROFILE_DIR, f"cycle-{stamp}")
+    logger.info(f"Profiling poll cycle ({_profile_remaining} more armed)")
+
+    top = {"current": -1, "snapshot": None, "where": "", "paused": 0.0}
+    def sample(where: str):
+        t0 = time.perf_counter()
+        current = tracemalloc.get_traced_memory()[0]
+        if current > top["current"]:
+            top["snapshot"] = None  # release the old snapshot before taking a larger one
+            top.update(current=current, snapshot=tracemalloc.take_snapshot(), where=where)
+        top["paused"] += time.perf_counter() - t0
+
+    # prof.disable() would flush cProfile's call stack and cut check_email_once's
+    # cumulative time short; a clock that stops during sampling keeps the stack intact
+    def profile_clock() -> float:
+        return time.perf_counter() - top["paused"]
+
+    own_tracing = not tracemalloc.is_tracing()
+    if own_tracing:
+        tracemalloc.start(PROFILE_TRACE_FRAMES)
+    prof = cProfile.Profile(profile_clock)
+    start = time.perf_counter()
+    _profile_sample_hook = sample
+    try:
+        prof.enable()
+        try:
+            fn()
+        finally:
+            prof.disable()
+    finally:
+        _profile_sample_hook = None
+        elapsed = time.perf_counter() - start - top["paused"]
+        sample("end of cycle")
+        current, peak = tracemalloc.get_traced_memory()
+        if own_tracing:
+            tracemalloc.stop()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            func_stats = pstats.Stats(prof)
+            code = sample.__code__
+            _drop_profiler_calls(func_stats, {(code.co_filename, code.co_firstlineno, code.co_name)})
+            func_stats.dump_stats(base + ".prof")
+            snapshot = top["snapshot"].filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+            own = _profiler_lines(profile_cycle, _profiler_lines, _drop_profiler_calls)
+            stats = [st for st in snapshot.statistics("lineno")
+                     if (st.traceback[0].filename, st.traceback[0].lineno) not in own]
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(f"cycle: {stamp}\nelapsed: {elapsed:.3f}s\n")
+                f.write(f"traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n\n")
+                f.write(f"Top {PROFILE_TOP_ALLOCS} allocations at the highest sampled memory "
+                        f"({top['current'] / 1024:.1f} KiB, {top['where']}), by line:\n")
+                for stat in stats[:PROFILE_TOP_ALLOCS]:
+                    f.write(f"  {stat}\n")
+                f.write(f"\nTop {PROFILE_TOP_FUNCS} functions by cumulative time:\n")
+                func_stats.stream = f
+                func_stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCS)
+            rotate_profiles()
+            logger.info(f"Profiled cycle took {elapsed:.2f}s (peak {peak / 1024:.1f} KiB) -> {base}.prof")
+        except Exception as e:
+            logger.warning(f"Failed to write profile {base}: {e}")
+
+def rotate_profiles():
+    """Keep only the newest PROFILE_KEEP profiled cycles in PROFILE_DIR"""
+    stems = sorted({os.path.splitext(n)[0] for n in os.listdir(PROFILE_DIR) if n.startswith("cycle-")})
+    for stem in stems[:max(0, len(stems) - PROFILE_KEEP)]:
+        for ext in (".prof", ".txt"):
+            try:
+                os.unlink(os.path.join(PROFILE_DIR, stem + ext))
+            except FileNotFoundError:
+                pass
+
+# -------------------------
+# One-shot mode (cron / systemd timer)
+# -------------------------
+def load_checkpoint() -> dict:
+    try:
+        with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_checkpoint(state: dict):
+    tmp = CHECKPOINT_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, CHECKPOINT_FILE)
+
+def mailbox_state(imap) -> Optional[dict]:
+    """INBOX UIDVALIDITY/UIDNEXT plus config.json mtime, or None if STATUS failed.
+    Any new message bumps UIDNEXT; a config edit may make skipped mail routable.
+    """
+    typ, data = imap.status("INBOX", "(UIDNEXT UIDVALIDITY)")
+    if typ != "OK" or not data or not data[0]:
+        return None
+    state = {k.decode().lower(): int(v) for k, v in re.findall(rb"(UIDNEXT|UIDVALIDITY) (\d+)", data[0])}
+    if "uidnext" not in state:
+        return None
+    try:
+        state["config_mtime"] = os.path.getmtime(CONFIG_FILE)
+    except OSError:
+        state["config_mtime"] = None
+    return state
+
+def run_once() -> int:
+    """Single poll for timer-driven deployments; returns the process exit code.
+    Exits right after login + STATUS when nothing changed since the last
+    complete run. The checkpoint only advances when nothing is left to retry.
+    """
+    # load_config, not reload_config_if_needed: its INFO line would open the log every tick
+    if not load_config().get("groups"):
+        logger.info("No groups configured in config.json → nothing to do")
+        return 0
+
+    try:
+        imap = connect_imap(select=False)
+    except Exception:
+        return 1
+
+    try:
+        state = mailbox_state(imap)
+        if state is not None and state == load_checkpoint():
+            logger.debug("No mailbox or config change since last run")
+            return 0
+
+        imap.select("INBOX")
+        complete = check_email_once(imap)
+        imap = None  # check_email_once logs out on every path
+        if state is not None and complete:
+            save_checkpoint(state)
+        return 0 if complete else 1
+    except Exception:
+        logger.exception("One-shot run failed")
+        return 1
+    finally:
+        if imap is not None:
+            try:
+                imap.logout()
+            except Exception:
+                pass
 
 # -------------------------
 # Main loop
 # -------------------------
 def main_loop():
+    logger.info("Starting email forwarder (strict IMAP mode)")
+    logger.info(f"IMAP: {IMAP_SERVER}:{IMAP_PORT} | Poll interval: {POLL_INTERVAL}s | Webhook: {WEBHOOK_URL}")
     logger.info("Email forwarder loop started.")
+    install_profiling_signal()
     try:
         while True:
             start = time.time()
             try:
-                check_email_once()
+                run_cycle()
             except Exception as e:
                 logger.exception("check_email_once crashed")
             elapsed = time.time() - start
@@ -385,4 +1071,6 @@ def main_loop():
         logger.exception("Fatal error in main loop")
 
 if __name__ == "__main__":
+    if "--once" in sys.argv[1:]:
+        sys.exit(run_once())
     main_loop()
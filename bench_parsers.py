@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+bench_parsers.py
+Micro-benchmark + regression suite for the per-message parsing hot path:
+- Builds a deterministic synthetic corpus (plain, HTML-only, multipart/alternative,
+  nested multipart, inline message/rfc822, large attachments, odd charsets,
+  base64 with stray characters, RFC2047 headers)
+- Measures throughput and peak allocations of decode_mime_words,
+  extract_text_from_html, get_first_text_block and the streaming parser;
+  MiB/s is only reported for functions that take the raw message bytes
+- Checks that get_first_text_block and StreamingMessageParser produce the same
+  forwarded body, and reports where the legacy etow.py / 180flat.py extraction
+  (lifted from those files with ast) diverges
+- Self-checks the attachment spool: sha256 per chunk size, dedupe, per-file
+  cap, eviction, abort cleanup and corrupt base64
+- Compares against a saved baseline and exits 1 on regressions
+
+Usage:
+    python bench_parsers.py --save-baseline      # on the deployment host, once
+    python bench_parsers.py                      # later runs compare to it
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import ast
+import hashlib
+import tempfile
+import tracemalloc
+import quopri
+import importlib.util
+import email
+import email.message
+from typing import Callable, Dict, List, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "bench_baseline.json")
+
+WORDS = [
+    "jadwal", "ujian", "tugas", "kuliah", "pengumuman", "akademik", "semester",
+    "deadline", "meeting", "invoice", "report", "schedule", "update", "please",
+    "review", "attached", "document", "nilai", "mahasiswa", "dosen",
+]
+ODD_CHARSETS = [
+    ("iso-8859-2", "Zażółć gęślą jaźń"),
+    ("koi8-r", "Съешь же ещё этих мягких французских булок"),
+    ("shift_jis", "いろはにほへと ちりぬるを"),
+    ("windows-1252", "Café – “quoted” naïve façade €"),
+    ("x-unknown-charset", "plain ascii under an unknown label"),
+]
+
+# -------------------------
+# Loading the forwarder
+# -------------------------
+def load_forwarder():
+    """Import Forwarder-V2.py as a module without it needing real credentials"""
+    os.environ.setdefault("EMAIL", "bench@example.invalid")
+    os.environ.setdefault("PASSWORD", "bench")
+    os.environ.setdefault("LOG_FILE", os.devnull)
+    spec = importlib.util.spec_from_file_location("forwarder_v2", os.path.join(HERE, "Forwarder-V2.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    mod.logger.disabled = True
+    return mod
+
+# -------------------------
+# Corpus
+# -------------------------
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+def _paragraphs(rng: random.Random, count: int) -> List[str]:
+    return [_sentence(rng, rng.randint(6, 18)) for _ in range(count)]
+
+def _html(rng: random.Random, count: int) -> str:
+    rows = "".join(
+        f"<tr><td>{i}</td><td>{_sentence(rng, 4)}</td><td>&euro;{rng.randint(1, 999)}</td></tr>"
+        for i in range(count)
+    )
+    paras = "".join(f"<p>{p} <a href='https://example.com/{i}'>link</a></p>" for i, p in enumerate(_paragraphs(rng, count)))
+    return (
+        "<html><head><style>p{margin:0}</style><script>var x = 1;</script></head>"
+        f"<body><div class='wrap'><h1>Pengumuman</h1>{paras}<table>{rows}</table>"
+        "<br/>&nbsp;&amp;&lt;end&gt;</div></body></html>"
+    )
+
+def _headers(rng: random.Random, subject: str, ctype: str, extra: str = "") -> str:
+    return (
+        f"From: Sender {rng.randint(1, 99)} <sender{rng.randint(1, 99)}@example.com>\r\n"
+        "To: inbox@example.com\r\n"
+        f"Subject: {subject}\r\n"
+        "MIME-Version: 1.0\r\n"
+        f"Content-Type: {ctype}\r\n"
+        f"{extra}"
+    )
+
+def _b64(data: bytes) -> str:
+    return base64.encodebytes(data).decode("ascii").replace("\n", "\r\n")
+
+def _qp(text: str, charset: str = "utf-8") -> str:
+    return quopri.encodestring(text.encode(charset)).decode("ascii").replace("\n", "\r\n")
+
+def _leaf(ctype: str, cte: str, body: str, extra: str = "") -> str:
+    return f"Content-Type: {ctype}\r\nContent-Transfer-Encoding: {cte}\r\n{extra}\r\n{body}\r\n"
+
+def _b64_stray(rng: random.Random, data: bytes) -> str:
+    """base64 with a character outside the alphabet dropped into some lines,
+    which decoders are expected to skip"""
+    lines = []
+    for line in _b64(data).split("\r\n"):
+        if line and rng.random() < 0.4:
+            at = rng.randint(0, len(line))
+            line = line[:at] + rng.choice(".!*#") + line[at:]
+        lines.append(line)
+    return "\r\n".join(lines)
+
+def _multipart(boundary: str, parts: List[str]) -> str:
+    out = "This is a multi-part message in MIME format.\r\n"
+    for p in parts:
+        out += f"--{boundary}\r\n{p}"
+    return out + f"--{boundary}--\r\n"
+
+def _rfc2047_b(text: str, charset: str = "utf-8") -> str:
+    return f"=?{charset}?B?{base64.b64encode(text.encode(charset)).decode('ascii')}?="
+
+def _rfc2047_q(text: str, charset: str = "iso-8859-1") -> str:
+    q = quopri.encodestring(text.encode(charset), header=True).decode("ascii")
+    return f"=?{charset}?Q?{q}?="
+
+def build_corpus(seed: int = 1234, scale: int = 1) -> List[Tuple[str, bytes]]:
+    """Return [(category, raw_rfc822_bytes)]; identical for identical (seed, scale)"""
+    rng = random.Random(seed)
+    corpus = []
+
+    def add(category: str, text: str):
+        corpus.append((category, text.encode("utf-8", errors="surrogateescape")))
+
+    for i in range(20 * scale):
+        body = "\r\n\r\n".join(_paragraphs(rng, rng.randint(2, 30)))
+        add("plain", _headers(rng, f"Plain {i}", "text/plain; charset=utf-8",
+                              "Content-Transfer-Encoding: 7bit\r\n") + "\r\n" + body + "\r\n")
+
+    for i in range(20 * scale):
+        add("html_only", _headers(rng, f"HTML {i}", "text/html; charset=utf-8",
+                                  "Content-Transfer-Encoding: quoted-printable\r\n")
+            + "\r\n" + _qp(_html(rng, rng.randint(3, 40))))
+
+    for i in range(20 * scale):
+        b = f"alt-{seed}-{i}"
+        text = "\r\n".join(_paragraphs(rng, rng.randint(2, 20)))
+        parts = [
+            _leaf("text/plain; charset=utf-8", "base64", _b64(text.encode("utf-8"))),
+            _leaf("text/html; charset=utf-8", "quoted-printable", _qp(_html(rng, 10))),
+        ]
+        add("alternative", _headers(rng, f"Alt {i}", f'multipart/alternative; boundary="{b}"')
+            + "\r\n" + _multipart(b, parts))
+
+    for i in range(10 * scale):
+        outer, related, alt = f"mix-{i}", f"rel-{i}", f"alt-n-{i}"
+        alt_part = f'Content-Type: multipart/alternative; boundary="{alt}"\r\n\r\n' + _multipart(alt, [
+            _leaf("text/html; charset=utf-8", "quoted-printable", _qp(_html(rng, 15))),
+            # plain after html: get_first_text_block must still prefer it
+            _leaf("text/plain; charset=utf-8", "quoted-printable", _qp("\n".join(_paragraphs(rng, 8)))),
+        ])
+        related_part = f'Content-Type: multipart/related; boundary="{related}"\r\n\r\n' + _multipart(related, [
+            alt_part,
+            _leaf("image/png", "base64", _b64(rng.randbytes(4096)), "Content-ID: <logo@x>\r\n"),
+        ])
+        attach = _leaf("application/pdf; name=\"laporan.pdf\"", "base64", _b64(rng.randbytes(20000)),
+                       'Content-Disposition: attachment; filename="laporan.pdf"\r\n')
+        add("nested", _headers(rng, f"Nested {i}", f'multipart/mixed; boundary="{outer}"')
+            + "\r\n" + _multipart(outer, [related_part, attach]))
+
+    for i in range(10 * scale):
+        outer, inner = f"fwd-{i}", f"fwd-alt-{i}"
+        forwarded = _headers(rng, f"Fwd {i}", f'multipart/alternative; boundary="{inner}"') + "\r\n" + _multipart(inner, [
+            _leaf("text/plain; charset=utf-8", "quoted-printable", _qp("\n".join(_paragraphs(rng, 6)))),
+            _leaf("text/html; charset=utf-8", "7bit", _html(rng, 5)),
+        ])
+        if i % 2:
+            # single-part forwarded message
+            forwarded = _headers(rng, f"Fwd {i}", "text/plain; charset=utf-8",
+                                 "Content-Transfer-Encoding: 7bit\r\n") + "\r\n" + "\r\n".join(_paragraphs(rng, 4))
+        parts = [
+            # html ahead of the forwarded text/plain: the plain part inside must still win
+            _leaf("text/html; charset=utf-8", "quoted-printable", _qp(_html(rng, 8))),
+            "Content-Type: message/rfc822\r\n\r\n" + forwarded + "\r\n",
+            _leaf("application/pdf; name=\"fwd.pdf\"", "base64", _b64(rng.randbytes(3000)),
+                  'Content-Disposition: attachment; filename="fwd.pdf"\r\n'),
+        ]
+        add("inline_rfc822", _headers(rng, f"Inline rfc822 {i}", f'multipart/mixed; boundary="{outer}"')
+            + "\r\n" + _multipart(outer, parts))
+
+    for i in range(2 * scale):
+        b = f"big-{i}"
+        parts = [
+            _leaf("text/plain; charset=utf-8", "7bit", "\r\n".join(_paragraphs(rng, 3))),
+            _leaf("application/octet-stream", "base64", _b64(rng.randbytes(4 * 1024 * 1024)),
+                  f'Content-Disposition: attachment; filename="dump-{i}.bin"\r\n'),
+        ]
+        add("large_attachment", _headers(rng, f"Big {i}", f'multipart/mixed; boundary="{b}"')
+            + "\r\n" + _multipart(b, parts))
+
+    for i in range(4 * scale):
+        for charset, sample in ODD_CHARSETS:
+            text = "\n".join([sample] * rng.randint(3, 30))
+            codec = charset if charset != "x-unknown-charset" else "ascii"
+            raw_body = _qp(text, codec)
+            add("charsets", _headers(rng, f"Charset {charset}", f"text/plain; charset={charset}",
+                                     "Content-Transfer-Encoding: quoted-printable\r\n") + "\r\n" + raw_body)
+            b = f"cs-{charset}-{i}"
+            parts = [
+                _leaf(f"text/plain; charset={charset}", "base64", _b64(text.encode(codec))),
+                _leaf("text/html; charset=utf-8", "7bit", f"<p>{sample}</p>"),
+            ]
+            add("charsets", _headers(rng, f"Charset mp {charset}", f'multipart/alternative; boundary="{b}"')
+                + "\r\n" + _multipart(b, parts))
+
+    for i in range(10 * scale):
+        text = "\r\n".join(_paragraphs(rng, rng.randint(2, 20))).encode("utf-8")
+        add("base64_stray", _headers(rng, f"Stray {i}", "text/plain; charset=utf-8",
+                                     "Content-Transfer-Encoding: base64\r\n") + "\r\n" + _b64_stray(rng, text))
+        b = f"stray-{i}"
+        parts = [
+            _leaf("text/plain; charset=utf-8", "base64", _b64_stray(rng, text)),
+            _leaf("application/octet-stream", "base64", _b64_stray(rng, rng.randbytes(rng.randint(1000, 9000))),
+                  f'Content-Disposition: attachment; filename="stray-{i}.bin"\r\n'),
+        ]
+        add("base64_stray", _headers(rng, f"Stray mp {i}", f'multipart/mixed; boundary="{b}"')
+            + "\r\n" + _multipart(b, parts))
+
+    for i in range(20 * scale):
+        subject = " ".join([
+            _rfc2047_b(f"Pengumuman ujian {i} — “{ODD_CHARSETS[i % 3][1]}”"),
+            "plain-part",
+            _rfc2047_q(f"café déjà vu {i}"),
+        ])
+        # fold the long header over two lines
+        subject = subject.replace(" plain-part ", "\r\n plain-part\r\n ")
+        sender = f"{_rfc2047_b('Dosen Pembimbing ' + str(i))} <dosen{i}@example.ac.id>"
+        if i % 5 == 0:
+            sender = f"=?x-unknown?B?{base64.b64encode(b'broken').decode()}?= <weird@example.com>"
+        add("rfc2047",
+            f"From: {sender}\r\nSubject: {subject}\r\nMIME-Version: 1.0\r\n"
+            "Content-Type: text/plain; charset=utf-8\r\n\r\n" + _sentence(rng, 10) + "\r\n")
+
+    return corpus
+
+# -------------------------
+# Legacy extraction
+# -------------------------
+# etow.py and 180flat.py poll at import time, so their body extraction is lifted
+# out of the source instead: the `body = ""` / `if msg.is_multipart():` pair
+# inside the polling function, plus a module-level extract_text_from_html.
+LEGACY_SCRIPTS = ("etow.py", "180flat.py")
+
+def _is_body_init(node) -> bool:
+    return (isinstance(node, ast.Assign) and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Name) and node.targets[0].id == "body"
+            and isinstance(node.value, ast.Constant) and node.value.value == "")
+
+def _is_multipart_if(node) -> bool:
+    return (isinstance(node, ast.If) and isinstance(node.test, ast.Call)
+            and isinstance(node.test.func, ast.Attribute) and node.test.func.attr == "is_multipart")
+
+def load_legacy_body(filename: str) -> Callable[[email.message.Message], str]:
+    """Compile the body extraction of a legacy script into legacy_body(msg) -> str"""
+    path = os.path.join(HERE, filename)
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+
+    block = None
+    for node in ast.walk(tree):
+        stmts = getattr(node, "body", None)
+        if not isinstance(stmts, list):
+            continue
+        for i in range(len(stmts) - 1):
+            if _is_body_init(stmts[i]) and _is_multipart_if(stmts[i + 1]):
+                block = stmts[i:i + 2]
+                break
+        if block:
+            break
+    if block is None:
+        raise ValueError(f"{filename}: body extraction (body = \"\" / if msg.is_multipart()) not found")
+
+    helpers = [n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == "extract_text_from_html"]
+    source = "".join(ast.unparse(n) + "\n" for n in helpers)
+    source += "def legacy_body(msg):\n"
+    source += "".join("    " + line + "\n" for s in block for line in ast.unparse(s).splitlines())
+    source += "    return body\n"
+
+    namespace = {"email": email}
+    if helpers:
+        from bs4 import BeautifulSoup
+        namespace["BeautifulSoup"] = BeautifulSoup
+    exec(compile(source, f"<legacy {filename}>", "exec"), namespace)
+    return namespace["legacy_body"]
+
+# -------------------------
+# Benchmarks
+# -------------------------
+def stream_message(fw, spool, raw: bytes, chunk: int = 0):
+    """Feed raw to a StreamingMessageParser in chunk-sized pieces (FETCH_CHUNK_SIZE by default)"""
+    chunk = chunk or fw.FETCH_CHUNK_SIZE
+    p = fw.StreamingMessageParser(spool)
+    for i in range(0, len(raw), chunk):
+        p.feed(raw[i:i + chunk])
+    p.close()
+    return p
+
+def build_cases(fw, corpus, spool) -> Dict[str, Dict[str, Tuple[Callable, list, int]]]:
+    """{function: {category: (fn, inputs, raw_bytes)}}
+    raw_bytes is None for functions fed pre-parsed objects or header/HTML
+    strings, whose throughput in MiB of message would be meaningless.
+    """
+    cases = {}
+
+    def add(name, category, fn, inputs, nbytes):
+        if inputs:
+            cases.setdefault(name, {})[category] = (fn, inputs, nbytes)
+
+    by_cat = {}
+    for category, raw in corpus:
+        by_cat.setdefault(category, []).append(raw)
+
+    def streaming(raw):
+        return stream_message(fw, spool, raw).result()[0]
+
+    def parse_and_extract(raw):
+        # the non-attachment forwarding path, same work as the streaming parser
+        return fw.get_first_text_block(email.message_from_bytes(raw))[0]
+
+    for category, raws in by_cat.items():
+        msgs = [email.message_from_bytes(r) for r in raws]
+        nbytes = sum(len(r) for r in raws)
+        headers = [h for m in msgs for h in (m.get("From", ""), m.get("Subject", ""))]
+        htmls = [
+            part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
+            for m in msgs for part in m.walk() if part.get_content_type() == "text/html"
+        ]
+        add("message_from_bytes", category, email.message_from_bytes, raws, nbytes)
+        add("decode_mime_words", category, fw.decode_mime_words, headers, None)
+        add("extract_text_from_html", category, fw.extract_text_from_html, htmls, None)
+        add("get_first_text_block", category, fw.get_first_text_block, msgs, None)
+        add("parse+get_first_text_block", category, parse_and_extract, raws, nbytes)
+        add("StreamingMessageParser", category, streaming, raws, nbytes)
+    return cases
+
+MIN_CASE_SECONDS = 0.25  # keep passing over small categories until timings are stable
+
+def time_case(fn, inputs, repeat: int) -> float:
+    """Best wall time of one pass across all inputs, over at least `repeat` passes"""
+    best = float("inf")
+    total = 0.0
+    passes = 0
+    while passes < repeat or total < MIN_CASE_SECONDS:
+        start = time.perf_counter()
+        for x in inputs:
+            fn(x)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        passes += 1
+    return best
+
+def alloc_case(fn, inputs) -> int:
+    """Largest traced peak of a single call, in bytes"""
+    worst = 0
+    tracemalloc.start()
+    try:
+        for x in inputs:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            fn(x)
+            _, peak = tracemalloc.get_traced_memory()
+            worst = max(worst, peak - base)
+    finally:
+        tracemalloc.stop()
+    return worst
+
+def run_benchmarks(cases, repeat: int) -> Dict[str, Dict[str, dict]]:
+    results = {}
+    for name, by_cat in cases.items():
+        for category, (fn, inputs, nbytes) in by_cat.items():
+            elapsed = time_case(fn, inputs, repeat)
+            results.setdefault(name, {})[category] = {
+                "calls_per_s": len(inputs) / elapsed if elapsed else float("inf"),
+                "mib_per_s": None if nbytes is None else (nbytes / elapsed / (1024 * 1024) if elapsed else float("inf")),
+                "peak_alloc_kib": alloc_case(fn, inputs) / 1024,
+            }
+    return results
+
+# -------------------------
+# Equivalence
+# -------------------------
+def check_equivalence(fw, corpus, spool) -> Tuple[List[str], Dict[str, Dict[str, int]]]:
+    """Return (failures, legacy_divergences).
+    get_first_text_block and the streaming parser must yield the same forwarded
+    body (after safe_truncate); legacy script divergences are only counted.
+    """
+    failures = []
+    divergences = {}
+    legacy = [(name, load_legacy_body(name)) for name in LEGACY_SCRIPTS]
+    for idx, (category, raw) in enumerate(corpus):
+        msg = email.message_from_bytes(raw)
+        ref = fw.safe_truncate(fw.get_first_text_block(msg)[0], fw.MAX_BODY_LENGTH)
+
+        p = stream_message(fw, spool, raw)
+        got = fw.safe_truncate(p.result()[0], fw.MAX_BODY_LENGTH)
+        if got != ref:
+            failures.append(f"{category}#{idx}: StreamingMessageParser body differs from get_first_text_block")
+        if p.headers.get("Subject") != msg.get("Subject") or p.headers.get("From") != msg.get("From"):
+            failures.append(f"{category}#{idx}: StreamingMessageParser headers differ")
+
+        for name, legacy_body in legacy:
+            try:
+                out = fw.safe_truncate(legacy_body(msg), fw.MAX_BODY_LENGTH)
+            except Exception:
+                out = None
+            if out != ref:
+                divergences.setdefault(name, {}).setdefault(category, 0)
+                divergences[name][category] += 1
+    return failures, divergences
+
+# -------------------------
+# Spool self-check
+# -------------------------
+SPOOL_CHUNK_SIZES = (7, 64, 65536)
+SMALL_CHUNK_MAX_MESSAGE = 256 * 1024  # tiny chunk sizes only on messages up to this size
+
+CORRUPT_ATTACHMENT = (
+    b'Content-Type: multipart/mixed; boundary="bad"\r\n\r\n'
+    b'--bad\r\nContent-Type: text/plain\r\n\r\nsee attachment\r\n'
+    b'--bad\r\nContent-Type: application/pdf\r\nContent-Transfer-Encoding: base64\r\n'
+    b'Content-Disposition: attachment; filename="broken.pdf"\r\n\r\n'
+    # 13 data characters: one more than a multiple of 4 cannot be decoded
+    b'JVBERi0xLjQK\r\nJ\r\n--bad--\r\n'
+)
+
+def _expected_attachments(msg: email.message.Message) -> List[str]:
+    """sha256 of every part get_first_text_block counts as an attachment"""
+    out = []
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        disp = str(part.get("Content-Disposition") or "").lower()
+        if part.get_filename() or "attachment" in disp:
+            out.append(hashlib.sha256(part.get_payload(decode=True) or b"").hexdigest())
+    return out
+
+def _spool_files(directory: str) -> Tuple[List[str], List[str]]:
+    """(committed files, leftover .part-* temp files)"""
+    names = os.listdir(directory)
+    return [n for n in names if not n.startswith(".part-")], [n for n in names if n.startswith(".part-")]
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def check_spool(fw, corpus) -> List[str]:
+    """Exercise AttachmentSpool + StreamingMessageParser beyond body text; return failures"""
+    failures = []
+    with_attachments = [(c, raw) for c, raw in corpus
+                        if c in ("nested", "inline_rfc822", "large_attachment", "base64_stray")]
+
+    # spooled sha256 and file contents match message_from_bytes at every chunk size
+    for category, raw in with_attachments:
+        expected = _expected_attachments(email.message_from_bytes(raw))
+        for chunk in SPOOL_CHUNK_SIZES:
+            if chunk < 1024 and len(raw) > SMALL_CHUNK_MAX_MESSAGE:
+                continue
+            with tempfile.TemporaryDirectory(prefix="bench-spool-") as d:
+                spool = fw.AttachmentSpool(d, 1024 * 1024 * 1024, 1024 * 1024 * 1024)
+                att = stream_message(fw, spool, raw, chunk).attachments
+                if [a["sha256"] for a in att] != expected:
+                    failures.append(f"{category}/chunk {chunk}: spooled sha256 differs from decoded payloads")
+                elif any(_file_sha256(a["path"]) != a["sha256"] for a in att):
+                    failures.append(f"{category}/chunk {chunk}: spool file content differs from its digest")
+                if _spool_files(d)[1]:
+                    failures.append(f"{category}/chunk {chunk}: .part-* files left behind")
+
+    nested = [raw for c, raw in corpus if c == "nested"]
+    large = next(raw for c, raw in corpus if c == "large_attachment")
+
+    # dedupe: the same attachment twice is stored once, under the same path
+    with tempfile.TemporaryDirectory(prefix="bench-spool-") as d:
+        spool = fw.AttachmentSpool(d, 1024 * 1024 * 1024, 1024 * 1024 * 1024)
+        first = stream_message(fw, spool, nested[0]).attachments
+        second = stream_message(fw, spool, nested[0]).attachments
+        if [a["path"] for a in first] != [a["path"] for a in second] or len(_spool_files(d)[0]) != len(first):
+            failures.append("dedupe: identical attachment stored more than once")
+
+    # per-file cap: oversized parts are reported and leave nothing on disk
+    with tempfile.TemporaryDirectory(prefix="bench-spool-") as d:
+        spool = fw.AttachmentSpool(d, 1024 * 1024 * 1024, 1000)
+        att = stream_message(fw, spool, nested[0]).attachments
+        if not att or any(a.get("skipped") != "too_large" or a["path"] for a in att):
+            failures.append(f"per-file cap: expected skipped=too_large, got {att}")
+        if any(_spool_files(d)):
+            failures.append("per-file cap: files left in spool")
+
+    # eviction: total stays under SPOOL_MAX_BYTES, newest attachment survives
+    with tempfile.TemporaryDirectory(prefix="bench-spool-") as d:
+        cap = 50 * 1024
+        spool = fw.AttachmentSpool(d, cap, 1024 * 1024 * 1024)
+        paths = []
+        for raw in nested[:5]:
+            paths += [a["path"] for a in stream_message(fw, spool, raw).attachments]
+            time.sleep(0.01)  # distinct mtimes so eviction order is well defined
+        files = _spool_files(d)[0]
+        total = sum(os.path.getsize(os.path.join(d, n)) for n in files)
+        if total > cap:
+            failures.append(f"eviction: spool holds {total} bytes, cap {cap}")
+        if not os.path.exists(paths[-1]):
+            failures.append("eviction: newest attachment was evicted")
+        if os.path.exists(paths[0]):
+            failures.append("eviction: oldest attachment was kept")
+
+    # abort mid-attachment removes the half-written temp file
+    with tempfile.TemporaryDirectory(prefix="bench-spool-") as d:
+        spool = fw.AttachmentSpool(d, 1024 * 1024 * 1024, 1024 * 1024 * 1024)
+        p = fw.StreamingMessageParser(spool)
+        p.feed(large[:len(large) // 2])
+        p.abort()
+        if any(_spool_files(d)):
+            failures.append("abort: files left in spool")
+
+    # corrupt base64 is reported, never committed under a wrong digest
+    with tempfile.TemporaryDirectory(prefix="bench-spool-") as d:
+        spool = fw.AttachmentSpool(d, 1024 * 1024 * 1024, 1024 * 1024 * 1024)
+        att = stream_message(fw, spool, CORRUPT_ATTACHMENT).attachments
+        if len(att) != 1 or att[0].get("skipped") != "decode_error" or att[0]["path"]:
+            failures.append(f"decode error: expected skipped=decode_error, got {att}")
+        if any(_spool_files(d)):
+            failures.append("decode error: files left in spool")
+
+    return failures
+
+# -------------------------
+# Regression check
+# -------------------------
+def compare_to_baseline(results, baseline, threshold: float) -> List[str]:
+    regressions = []
+    for name, by_cat in results.items():
+        for category, cur in by_cat.items():
+            old = baseline.get(name, {}).get(category)
+            if not old:
+                continue
+            if cur["calls_per_s"] < old["calls_per_s"] * (1 - threshold):
+                regressions.append(
+                    f"{name}/{category}: {cur['calls_per_s']:.1f} calls/s vs baseline {old['calls_per_s']:.1f}"
+                )
+            if cur["peak_alloc_kib"] > old["peak_alloc_kib"] * (1 + threshold) + 16:
+                regressions.append(
+                    f"{name}/{category}: peak {cur['peak_alloc_kib']:.1f} KiB vs baseline {old['peak_alloc_kib']:.1f} KiB"
+                )
+    return regressions
+
+def print_results(results):
+    print(f"{'function':<28} {'category':<18} {'calls/s':>12} {'MiB/s':>9} {'peak KiB':>10}")
+    for name, by_cat in results.items():
+        for category, r in by_cat.items():
+            mib = "-" if r["mib_per_s"] is None else f"{r['mib_per_s']:.2f}"
+            print(f"{name:<28} {category:<18} {r['calls_per_s']:>12.1f} {mib:>9} {r['peak_alloc_kib']:>10.1f}")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--scale", type=int, default=1, help="corpus size multiplier")
+    ap.add_argument("--repeat", type=int, default=5, help="timing passes, best is kept")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args(argv)
+
+    fw = load_forwarder()
+    corpus = build_corpus(args.seed, args.scale)
+    print(f"Corpus: {len(corpus)} messages, {sum(len(r) for _, r in corpus) / (1024 * 1024):.1f} MiB (seed {args.seed})")
+
+    with tempfile.TemporaryDirectory(prefix="bench-spool-") as spool_dir:
+        spool = fw.AttachmentSpool(spool_dir, 1024 * 1024 * 1024, fw.ATTACHMENT_MAX_BYTES)
+        failures, divergences = check_equivalence(fw, corpus, spool)
+        spool_failures = check_spool(fw, corpus)
+        results = run_benchmarks(build_cases(fw, corpus, spool), args.repeat)
+
+    print_results(results)
+    for name, by_cat in divergences.items():
+        detail = ", ".join(f"{c}={n}" for c, n in sorted(by_cat.items()))
+        print(f"Legacy {name} diverges from get_first_text_block: {detail}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "legacy_divergences": divergences,
+                       "failures": failures, "spool_failures": spool_failures}, f, indent=2)
+
+    status = 0
+    for f in failures:
+        print(f"EQUIVALENCE FAIL: {f}")
+        status = 1
+    for f in spool_failures:
+        print(f"SPOOL FAIL: {f}")
+        status = 1
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        for r in compare_to_baseline(results, baseline, args.threshold):
+            print(f"REGRESSION: {r}")
+            status = 1
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py
+Startup-time benchmark for `Forwarder-V2.py --once`:
+- Runs the one-shot entry point in fresh interpreters against an in-process
+  fake IMAP server whose STATUS matches the saved checkpoint (the common
+  "nothing new" timer tick)
+- Compares it with a bare interpreter and with importing bs4 + requests,
+  the cost the one-shot path is meant to avoid
+- Fails if a no-change run imports bs4/requests, opens the log file, or
+  takes more than --max-ms over a bare interpreter
+
+Usage:
+    python bench_startup.py [--runs 20] [--max-ms 150]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FORWARDER = os.path.join(HERE, "Forwarder-V2.py")
+HEAVY_MODULES = ("bs4", "requests")
+
+# -------------------------
+# Child: fake IMAP + one-shot run
+# -------------------------
+# Run with `python -c` so the timed process imports nothing but the forwarder,
+# imaplib (which the forwarder needs anyway) and runpy.
+CHILD_BOOTSTRAP = """
+import sys, imaplib, runpy
+
+class FakeIMAP:
+    # just enough of IMAP4_SSL for a run that finds nothing to forward
+    def __init__(self, host, port=None): pass
+    def login(self, user, password): return "OK", [b"Logged in"]
+    def status(self, mailbox, names): return "OK", [b'"INBOX" (UIDNEXT 4242 UIDVALIDITY 7)']
+    def select(self, mailbox="INBOX"): return "OK", [b"0"]
+    def search(self, charset, criteria): return "OK", [b""]
+    def logout(self): return "BYE", [b""]
+
+imaplib.IMAP4_SSL = FakeIMAP
+forwarder, report = sys.argv[1], sys.argv[2]
+sys.argv = [forwarder, "--once"]
+code = 0
+try:
+    runpy.run_path(forwarder, run_name="__main__")
+except SystemExit as e:
+    code = e.code or 0
+import json
+with open(report, "w", encoding="utf-8") as f:
+    json.dump({"exit": code, "heavy_imported": [m for m in %r if m in sys.modules]}, f)
+""" % (HEAVY_MODULES,)
+
+# -------------------------
+# Parent: timing
+# -------------------------
+def time_runs(cmd, env, runs: int) -> list:
+    out = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        out.append((time.perf_counter() - start) * 1000)
+    return out
+
+def summary(name: str, samples: list) -> str:
+    return (f"{name:<34} median {statistics.median(samples):7.1f} ms"
+            f"   min {min(samples):7.1f} ms   max {max(samples):7.1f} ms")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--max-ms", type=float, default=150.0,
+                    help="fail if the median no-change run exceeds a bare interpreter by more than this")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as tmp:
+        config = os.path.join(tmp, "config.json")
+        with open(config, "w", encoding="utf-8") as f:
+            json.dump({"groups": {"bench": {"senders": ["bench@example.com"], "target": "0@c.us"}}}, f)
+        env = dict(os.environ,
+                   EMAIL="bench@example.invalid", PASSWORD="bench",
+                   CONFIG_FILE=config,
+                   CHECKPOINT_FILE=os.path.join(tmp, "checkpoint.json"),
+                   LOG_FILE=os.path.join(tmp, "forwarder.log"))
+        report = os.path.join(tmp, "report.json")
+        child_cmd = [sys.executable, "-c", CHILD_BOOTSTRAP, FORWARDER, report]
+
+        # first run sees no checkpoint, does a full (empty) poll and writes one
+        subprocess.run(child_cmd, env=env, check=False)
+        if not os.path.exists(env["CHECKPOINT_FILE"]):
+            print("FAIL: first --once run did not write a checkpoint")
+            return 1
+        if os.path.exists(env["LOG_FILE"]):
+            os.unlink(env["LOG_FILE"])
+
+        once = time_runs(child_cmd, env, args.runs)
+        with open(report, "r", encoding="utf-8") as f:
+            last = json.load(f)
+        bare = time_runs([sys.executable, "-c", "pass"], env, args.runs)
+        heavy = time_runs([sys.executable, "-c", "import bs4, requests"], env, args.runs)
+        log_written = os.path.exists(env["LOG_FILE"])
+
+    print(summary("python -c pass", bare))
+    print(summary("import bs4, requests", heavy))
+    print(summary("Forwarder-V2.py --once (no change)", once))
+    print(f"heavy modules imported: {last['heavy_imported'] or 'none'} | log file opened: {log_written} "
+          f"| exit code: {last['exit']}")
+
+    status = 0
+    if last["exit"] != 0:
+        print("FAIL: no-change run did not exit 0")
+        status = 1
+    if last["heavy_imported"]:
+        print(f"FAIL: no-change run imported {', '.join(last['heavy_imported'])}")
+        status = 1
+    if log_written:
+        print("FAIL: no-change run opened the log file")
+        status = 1
+    overhead = statistics.median(once) - statistics.median(bare)
+    print(f"one-shot overhead over bare interpreter: {overhead:.1f} ms (limit {args.max_ms:.0f} ms)")
+    if overhead > args.max_ms:
+        print(f"FAIL: no-change run costs {overhead:.1f} ms over a bare interpreter, over --max-ms {args.max_ms}")
+        status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())